@@ -1,14 +1,21 @@
 """ benchmarking utilities for sysidexpr """
-import json
+import functools
+import hashlib
 import os
 import pathlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable
+from typing import Dict
+from typing import List
 from typing import Tuple
 
 import autokoopman.core.trajectory as atraj
 import numpy as np
 import pandas as pd
-from pydantic import parse_obj_as
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 
 from sysidexpr.model import BenchmarkConfiguration
 from sysidexpr.model import BenchmarkSchema
@@ -17,13 +24,160 @@ from sysidexpr.model import PredictionConfiguration
 from sysidexpr.model import PredictionResult
 
 
+@functools.lru_cache(maxsize=16)
+def _load_benchmark_schema(schema_path: str, mtime: int) -> BenchmarkSchema:
+    """parse and validate a schema file (mtime is only part of the cache key)"""
+    # open the json and load into the relevant config models (pydantic parses
+    # the raw bytes directly, without an intermediate dict)
+    with open(schema_path, "rb") as fp:
+        return BenchmarkSchema.model_validate_json(fp.read())
+
+
 def load_benchmark_configs(schema_path: pathlib.Path) -> BenchmarkSchema:
-    """load the benchmark schema from a json file"""
+    """load the benchmark schema from a json file
+
+    the schema is cached until the file changes, so treat it as read-only
+    """
     assert os.path.isfile(schema_path)
-    # open the json and load into the relevant config models
-    with open(schema_path, "r") as fp:
-        benchmarks_raw = json.load(fp)
-    return parse_obj_as(BenchmarkSchema, benchmarks_raw)
+    return _load_benchmark_schema(
+        str(schema_path), os.stat(schema_path).st_mtime_ns
+    )
+
+
+def _read_csv_table(
+    csv_path: pathlib.Path, columns: List[str], column_types: Dict[str, pa.DataType]
+) -> pa.Table:
+    """parse only the needed columns of a csv (arrow parses multithreaded)"""
+    return pacsv.read_csv(
+        csv_path,
+        read_options=pacsv.ReadOptions(use_threads=True, block_size=8 << 20),
+        convert_options=pacsv.ConvertOptions(
+            column_types=column_types, include_columns=columns
+        ),
+    )
+
+
+def _read_table(
+    csv_path: str,
+    columns: List[str],
+    column_types: Dict[str, pa.DataType],
+    side_cache: bool = True,
+) -> pa.Table:
+    """read the needed columns of a csv, going through a parquet side-cache
+
+    the first read parses the csv and writes the table to .cache/ next to the
+    csv; later reads load the parquet file instead. the cache file name is a
+    prefix for the csv and column set plus a version from the csv's mtime and
+    size, so any change to the csv (even to an older mtime) misses it, and older
+    versions are removed when a new one is written
+    """
+    csv_path = pathlib.Path(csv_path)
+    if not side_cache:
+        return _read_csv_table(csv_path, columns, column_types)
+
+    csv_stat = csv_path.stat()
+    prefix = hashlib.sha1(
+        f"{csv_path.resolve()}{columns}{sorted(column_types.items())}".encode()
+    ).hexdigest()[:16]
+    version = hashlib.sha1(
+        f"{csv_stat.st_mtime_ns}{csv_stat.st_size}".encode()
+    ).hexdigest()[:8]
+    cache_dir = csv_path.parent / ".cache"
+    cache_path = cache_dir / f"{csv_path.stem}-{prefix}-{version}.parquet"
+
+    if cache_path.is_file():
+        # a cache that can't be read is ignored and rewritten below
+        try:
+            return pq.read_table(cache_path, columns=columns)
+        except (pa.ArrowException, OSError):
+            pass
+
+    table = _read_csv_table(csv_path, columns, column_types)
+
+    # the cache is best effort, e.g. the data directory may be read-only. write
+    # to a temporary file and move it into place, so readers never see a
+    # partially written cache
+    tmp_path = None
+    try:
+        cache_dir.mkdir(exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            dir=cache_dir, suffix=".tmp", delete=False
+        ) as fp:
+            tmp_path = fp.name
+        pq.write_table(table, tmp_path, compression="zstd")
+        os.replace(tmp_path, cache_path)
+
+        # drop the older versions of this csv and column set
+        for stale_path in cache_dir.glob(f"{csv_path.stem}-{prefix}-*.parquet"):
+            if stale_path != cache_path:
+                try:
+                    stale_path.unlink()
+                except FileNotFoundError:
+                    pass
+    except OSError:
+        if tmp_path is not None and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return table
+
+
+@functools.lru_cache(maxsize=32)
+def _load_trajectories_cached(
+    csv_path: str,
+    states: Tuple[str, ...],
+    groups: Tuple[str, ...],
+    time: str,
+    traj: str,
+    mtime: int,
+    side_cache: bool = True,
+) -> Dict[str, atraj.TrajectoriesData]:
+    """load the trajectories from a csv (mtime is only part of the cache key)"""
+    states = list(states)
+
+    # give the parser the column types up front so it doesn't infer them
+    column_types = {
+        **{s: pa.float32() for s in states},
+        time: pa.float64(),
+        **{g: pa.bool_() for g in groups},
+    }
+
+    # put the csv contents into a pandas frame
+    data_df = _read_table(
+        csv_path, [traj, time, *states, *groups], column_types, side_cache
+    ).to_pandas(split_blocks=True, self_destruct=True)
+
+    # group on integer codes rather than hashing the subject ids every time
+    data_df[traj] = data_df[traj].astype("category")
+
+    def extract_time_states(df):
+        """pack the states and times into a autokoopman trajectory (df is sorted)"""
+        return atraj.Trajectory(
+            times=df[time].to_numpy(),
+            states=df[states].to_numpy(dtype=np.float32),
+            inputs=None,
+            state_names=states,
+        )
+
+    # build them into a TrajectoriesData, one group at a time
+    trajectories = {}
+    for groupname in groups:
+        # filter the group once, then split by subject id (only subjects in the
+        # group show up); an empty flag cell counts as not in the group
+        group_df = data_df[data_df[groupname].fillna(False).to_numpy(dtype=bool)]
+
+        # sort by (subject, time) once so every subject slice is already in order
+        codes = group_df[traj].cat.codes.to_numpy()
+        group_df = group_df.iloc[np.lexsort((group_df[time].to_numpy(), codes))]
+        group_trajs = {
+            sid: extract_time_states(s_df)
+            for sid, s_df in group_df.groupby(traj, sort=False, observed=True)
+        }
+        trajectories[groupname] = atraj.TrajectoriesData(group_trajs)
+
+        # release this group's intermediates before filtering the next one
+        del group_df, group_trajs
+
+    return trajectories
 
 
 class Benchmark:
@@ -32,64 +186,54 @@ class Benchmark:
     def __init__(self, config: BenchmarkConfiguration):
         self.config = config
 
-    def load_trajectories(self):
-        # put the csv contents into a pandas frame
-        data_df = pd.read_csv(self.config.data_csv)
-
-        def extract_time_states(df):
-            """pack the states and times into a autokoopman trajectory"""
-            times = df[self.config.time].to_numpy().flatten()
-            idxs = np.argsort(times)
-            states = df[self.config.states].to_numpy()
-            return atraj.Trajectory(
-                times=times[idxs],
-                states=states[idxs],
-                inputs=None,
-                state_names=self.config.states,
-            )
-
-        # group by subject id
-        subjects_dfs = data_df.groupby(data_df[self.config.traj])
-
-        # build them into a TrajectoriesData
-        trajectories = {g: {} for g in self.config.groups}
-        for groupname in self.config.groups:
-            for sid, s_df in subjects_dfs:
-                # candidate may not be in these groups
-                candidate_df = s_df.loc[s_df[groupname] == True]
-                if len(candidate_df) > 0:
-                    trajectories[groupname][sid] = extract_time_states(candidate_df)
+    def load_trajectories(self, side_cache: bool = True):
+        """load the trajectories of every group in the benchmark csv
 
-        return {g: atraj.TrajectoriesData(ts) for g, ts in trajectories.items()}
+        results are cached per (csv, mtime, columns) and shared between calls, so
+        treat the returned trajectories as read-only. side_cache controls the
+        on-disk parquet copy of the csv; turn it off for files that are only
+        read once
+        """
+        return _load_trajectories_cached(
+            str(self.config.data_csv),
+            tuple(self.config.states),
+            tuple(self.config.groups),
+            self.config.time,
+            self.config.traj,
+            os.stat(self.config.data_csv).st_mtime_ns,
+            side_cache,
+        )
 
     def store_trajectories(self, pred_trajs, group_name="Test") -> pd.DataFrame:
         """store the predicted trajectories in a DataFrame"""
-        # create the DataFrame columns
-        columns = [self.config.traj, self.config.time, *self.config.states, group_name]
-
-        # add rows per trajectory id
-        traj_rows = []
-        for tname, traj in pred_trajs._trajs.items():
-            data = np.hstack(
-                (
-                    [
-                        [tname],
-                    ]
-                    * len(traj.times),
-                    np.atleast_2d(traj.times).T,
-                    traj.states,
-                    [
-                        [
-                            True,
-                        ],
-                    ]
-                    * len(traj.times),
-                )
-            )
-            traj_rows.append(data)
+        trajs = pred_trajs._trajs
+        lengths = [len(traj.times) for traj in trajs.values()]
 
-        # stack to create a DataFrame
-        return pd.DataFrame(columns=columns, data=np.vstack(traj_rows))
+        # trajectory ids as a categorical (codes + names), not an object column
+        names_out = pd.Categorical.from_codes(
+            np.repeat(np.arange(len(trajs)), lengths), categories=list(trajs.keys())
+        )
+
+        # allocate every column once and fill it trajectory by trajectory
+        total = sum(lengths)
+        times_out = np.empty(total)
+        states_out = np.empty((total, len(self.config.states)))
+
+        idx = 0
+        for traj in trajs.values():
+            n = len(traj.times)
+            times_out[idx : idx + n] = traj.times
+            states_out[idx : idx + n] = traj.states
+            idx += n
+
+        return pd.DataFrame(
+            {
+                self.config.traj: names_out,
+                self.config.time: times_out,
+                **{s: states_out[:, k] for k, s in enumerate(self.config.states)},
+                group_name: np.ones(total, dtype=bool),
+            }
+        )
 
     @staticmethod
     def score_benchmark(
@@ -101,19 +245,24 @@ class Benchmark:
     ) -> PredictionResult:
         """runs a scoring function from a prediction configuration"""
 
-        data_traj = Benchmark(prediction.benchmark).load_trajectories()
-
-        pred_traj = Benchmark(
-            BenchmarkConfiguration(
-                name=prediction.benchmark.name,
-                data_csv=prediction.pred_csv,
-                prediction_dir=prediction.benchmark.prediction_dir,
-                states=prediction.benchmark.states,
-                groups=[test_group],
-                time=prediction.benchmark.time,
-                traj=prediction.benchmark.traj,
+        # swap in the prediction csv without revalidating the benchmark fields
+        pred_benchmark = Benchmark(
+            prediction.benchmark.model_copy(
+                update={"data_csv": prediction.pred_csv, "groups": [test_group]}
+            )
+        )
+
+        # load the data and the predictions concurrently (the csv reading
+        # releases the GIL)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            data_future = executor.submit(
+                Benchmark(prediction.benchmark).load_trajectories
+            )
+            # predictions are usually scored once, so don't side-cache them
+            pred_future = executor.submit(
+                pred_benchmark.load_trajectories, side_cache=False
             )
-        ).load_trajectories()
+            data_traj, pred_traj = data_future.result(), pred_future.result()
 
         m, v = scoring_fcn(data_traj[test_group], pred_traj[test_group])
 
@@ -6,11 +6,13 @@ way to allow for easy use of the package.
 
 Maybe in the future, this should be changed to a namespace.
 """
+import functools
 import os
 import pathlib
+from typing import List
 
-import pydantic
 from pydantic import BaseModel
+from pydantic import field_validator
 
 from sysidexpr.model import BenchmarkConfiguration
 
@@ -33,15 +35,26 @@ scores_base_path = pathlib.Path(
 )
 
 
+# paths already found to be directories; failures are not remembered, so a
+# drive mounted later is picked up on the next check
+_known_dirs = set()
+
+
+def _isdir_cached(path: str) -> bool:
+    """os.path.isdir, skipping the stat for paths that already passed"""
+    if path in _known_dirs:
+        return True
+    if os.path.isdir(path):
+        _known_dirs.add(path)
+        return True
+    return False
+
+
 def validate_consts():
     """validates the constants"""
-    assert os.path.isdir(data_base_path), f"path {data_base_path} is not a directory"
-    assert os.path.isdir(
-        predictions_base_path
-    ), f"path {predictions_base_path} is not a directory"
-    assert os.path.isdir(
-        scores_base_path
-    ), f"path {scores_base_path} is not a directory"
+    for path in (data_base_path, predictions_base_path, scores_base_path):
+        if not _isdir_cached(str(path)):
+            raise AssertionError(f"path {path} is not a directory")
 
 
 class ConstConfig(BaseModel):
@@ -56,19 +69,22 @@ class ConstConfig(BaseModel):
     scores_base_path: pathlib.Path
 
     # setup validators
-    @pydantic.validator("data_base_path", pre=True)
+    @field_validator("data_base_path", mode="before")
+    @classmethod
     def data_base_path_exists(cls, v):
         if not os.path.isdir(v):
             raise ValueError(f"path {v} is not a directory")
         return v
 
-    @pydantic.validator("predictions_base_path", pre=True)
+    @field_validator("predictions_base_path", mode="before")
+    @classmethod
     def predictions_base_path_exists(cls, v):
         if not os.path.isdir(v):
             raise ValueError(f"path {v} is not a directory")
         return v
 
-    @pydantic.validator("scores_base_path", pre=True)
+    @field_validator("scores_base_path", mode="before")
+    @classmethod
     def scores_base_path_exists(cls, v):
         if not os.path.isdir(v):
             raise ValueError(f"path {v} is not a directory")
@@ -92,28 +108,15 @@ def load_constants(config: ConstConfig):
 
 def load_constants_from_json(json_path: pathlib.Path):
     """loads the constants from a json file"""
-    config = ConstConfig.parse_file(json_path)
+    with open(json_path, "rb") as fp:
+        config = ConstConfig.model_validate_json(fp.read())
     load_constants(config)
 
 
-plasma_config = None
-imaging_config = None
-cmu_config = None
-fhn_config = None
-lorenz_config = None
-benchmarks = None
-
-
-def update_configurations():
-    global plasma_config
-    global imaging_config
-    global cmu_config
-    global fhn_config
-    global lorenz_config
-    global benchmarks
-
-    # create a list of default prediction configurations
-    plasma_config = BenchmarkConfiguration(
+@functools.lru_cache(maxsize=None)
+def get_plasma_config() -> BenchmarkConfiguration:
+    """plasma benchmark configuration"""
+    return BenchmarkConfiguration(
         name="plasma",
         data_csv=scaled_data_base_path
         / "plasma"
@@ -125,7 +128,11 @@ def update_configurations():
         traj="WRAPNo",
     )
 
-    cmu_config = BenchmarkConfiguration(
+
+@functools.lru_cache(maxsize=None)
+def get_cmu_config() -> BenchmarkConfiguration:
+    """cmu walking benchmark configuration"""
+    return BenchmarkConfiguration(
         name="cmu",
         data_csv=scaled_data_base_path / "cmu" / "CMU_data_1.csv",
         prediction_dir=predictions_base_path / "CMU Walking data",
@@ -135,7 +142,11 @@ def update_configurations():
         traj="id",
     )
 
-    fhn_config = BenchmarkConfiguration(
+
+@functools.lru_cache(maxsize=None)
+def get_fhn_config() -> BenchmarkConfiguration:
+    """fitzhugh-nagumo benchmark configuration"""
+    return BenchmarkConfiguration(
         name="fhn",
         data_csv=scaled_data_base_path / "fhn" / "FHN_data_1.csv",
         prediction_dir=predictions_base_path / "FHN data",
@@ -145,7 +156,11 @@ def update_configurations():
         traj="id",
     )
 
-    lorenz_config = BenchmarkConfiguration(
+
+@functools.lru_cache(maxsize=None)
+def get_lorenz_config() -> BenchmarkConfiguration:
+    """lorenz benchmark configuration"""
+    return BenchmarkConfiguration(
         name="lorenz",
         data_csv=scaled_data_base_path / "lorenz" / "Lorenz_data_1.csv",
         prediction_dir=predictions_base_path / "Lorenz data",
@@ -155,6 +170,10 @@ def update_configurations():
         traj="id",
     )
 
+
+@functools.lru_cache(maxsize=None)
+def get_lorenz96_configs() -> List[BenchmarkConfiguration]:
+    """lorenz96 benchmark configurations of different dimensions"""
     lorenz96_configs = []
     for n in {16, 32, 128}:
         lorenz96_configs.append(
@@ -170,8 +189,13 @@ def update_configurations():
                 traj="id",
             )
         )
+    return lorenz96_configs
+
 
-    imaging_config = BenchmarkConfiguration(
+@functools.lru_cache(maxsize=None)
+def get_imaging_config() -> BenchmarkConfiguration:
+    """pib imaging benchmark configuration"""
+    return BenchmarkConfiguration(
         name="imaging",
         data_csv=scaled_data_base_path / "imaging" / "pib_roi_annotated.csv",
         prediction_dir=predictions_base_path / "Imaging data",
@@ -299,16 +323,40 @@ def update_configurations():
         traj="wrapno",
     )
 
-    # create a list of benchmark configurations
-    benchmarks = [
-        fhn_config,
-        *lorenz96_configs,
-        plasma_config,
-        lorenz_config,
-        cmu_config,
-        imaging_config,
+
+@functools.lru_cache(maxsize=None)
+def get_benchmarks() -> List[BenchmarkConfiguration]:
+    """list of all the benchmark configurations"""
+    return [
+        get_fhn_config(),
+        *get_lorenz96_configs(),
+        get_plasma_config(),
+        get_lorenz_config(),
+        get_cmu_config(),
+        get_imaging_config(),
     ]
 
 
-# default
-update_configurations()
+# configurations exposed as module attributes, built on first access
+_config_getters = {
+    "plasma_config": get_plasma_config,
+    "imaging_config": get_imaging_config,
+    "cmu_config": get_cmu_config,
+    "fhn_config": get_fhn_config,
+    "lorenz_config": get_lorenz_config,
+    "benchmarks": get_benchmarks,
+}
+
+
+def update_configurations():
+    """drop the cached configurations so they are rebuilt from the current paths"""
+    for getter in _config_getters.values():
+        getter.cache_clear()
+    get_lorenz96_configs.cache_clear()
+
+
+def __getattr__(name):
+    """lazily build the configurations on attribute access (PEP 562)"""
+    if name in _config_getters:
+        return _config_getters[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
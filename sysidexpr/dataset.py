@@ -1,26 +1,61 @@
 """Data Access for S3 Hosted Datasets"""
+import functools
+import hashlib
+import io
 import os
-import sys
+import pathlib
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
 from typing import Dict
 
-import boto3
-import botocore
+import numpy as np
 import pandas as pd
-
-if sys.version_info[0] < 3:
-    from StringIO import StringIO  # Python 2.x
-else:
-    from io import StringIO  # Python 3.x
+import pyarrow as pa
 
 import autokoopman.core.trajectory as atraj
 
 
+@functools.lru_cache(maxsize=1)
+def _make_s3_client(region, endpoint, access_key, secret_key):
+    """build an s3 client, shared by every loader with the same settings
+
+    boto3 clients are thread-safe, so the connection pool is sized for
+    concurrent downloads
+    """
+    # boto3 is slow to import, only pay for it when a client is needed
+    import boto3
+    import botocore.config
+
+    return boto3.client(
+        "s3",
+        config=botocore.config.Config(
+            max_pool_connections=64,
+            retries={"max_attempts": 10, "mode": "adaptive"},
+            s3={"addressing_style": "virtual", "use_accelerate_endpoint": False},
+        ),
+        region_name=region,
+        endpoint_url=endpoint,
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+    )
+
+
+# clients and their pooled connections are not fork-safe, so forked workers
+# (e.g. the tuner's process pool) build their own
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_make_s3_client.cache_clear)
+
+
 class S3CsvLoader:
     """Base class for loading CSVs from S3"""
 
     bucket_name = "sysidexpr"
     object_key = None
 
+    # local copies of the objects, keyed by ETag
+    cache_dir = pathlib.Path.home() / ".cache" / "sysidexpr"
+
     @staticmethod
     def get_s3_client():
         # check that the environment variables are set
@@ -37,32 +72,117 @@ class S3CsvLoader:
             "bucket_secret_key": os.environ.get("SYSIDEXPR_SECRET_KEY"),
         }
 
-        return boto3.client(
-            "s3",
-            config=botocore.config.Config(s3={"addressing_style": "virtual"}),
-            region_name=s3_configs["default_region"],
-            endpoint_url=s3_configs["default_endpoint"],
-            aws_access_key_id=s3_configs["bucket_access_key"],
-            aws_secret_access_key=s3_configs["bucket_secret_key"],
+        return _make_s3_client(
+            s3_configs["default_region"],
+            s3_configs["default_endpoint"],
+            s3_configs["bucket_access_key"],
+            s3_configs["bucket_secret_key"],
         )
 
     @classmethod
-    def load_csv(cls) -> pd.DataFrame:
-        """Load the CSV from S3"""
+    def load_csv(cls, **read_csv_kwargs) -> pd.DataFrame:
+        """Load the CSV from S3 (keyword arguments are passed to pd.read_csv)
+
+        the parsed frame is cached on disk as parquet and reused as long as the
+        object's ETag doesn't change
+        """
         client = cls.get_s3_client()
-        csv_obj = client.get_object(Bucket=cls.bucket_name, Key=cls.object_key)
-        body = csv_obj["Body"]
-        csv_string = body.read().decode("utf-8")
-        df = pd.read_csv(StringIO(csv_string))
+        etag_header = client.head_object(Bucket=cls.bucket_name, Key=cls.object_key)[
+            "ETag"
+        ]
+        etag = etag_header.strip('"')
+        kwargs_key = hashlib.sha1(repr(sorted(read_csv_kwargs.items())).encode())
+        object_prefix = cls.object_key.replace("/", "_")
+        cache_path = cls.cache_dir / (
+            f"{object_prefix}-{etag}-{kwargs_key.hexdigest()[:8]}.parquet"
+        )
+        if cache_path.is_file():
+            # a cache that can't be read is ignored and rewritten below
+            try:
+                return pd.read_parquet(cache_path)
+            except (pa.ArrowException, OSError):
+                pass
+
+        # only accept the version whose ETag names the cache file
+        csv_obj = client.get_object(
+            Bucket=cls.bucket_name, Key=cls.object_key, IfMatch=etag_header
+        )
+        # stream the body into arrow's multithreaded parser instead of decoding
+        # it all in memory
+        df = pd.read_csv(csv_obj["Body"], engine="pyarrow", **read_csv_kwargs)
+
+        # the cache is best effort, e.g. the home directory may be read-only.
+        # write to a temporary file and move it into place, so readers never
+        # see a partially written cache
+        tmp_path = None
+        try:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                dir=cache_path.parent, suffix=".tmp", delete=False
+            ) as fp:
+                tmp_path = fp.name
+            df.to_parquet(tmp_path, compression="zstd")
+            os.replace(tmp_path, cache_path)
+
+            # drop the copies of older versions of this object
+            for stale_path in cls.cache_dir.glob(f"{object_prefix}-*.parquet"):
+                if not stale_path.name.startswith(f"{object_prefix}-{etag}-"):
+                    try:
+                        stale_path.unlink()
+                    except FileNotFoundError:
+                        pass
+        except OSError:
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
         return df
 
+    @classmethod
+    def load_csv_parallel(cls, n_chunks: int = 8, **read_csv_kwargs) -> pd.DataFrame:
+        """Load the CSV from S3, downloading byte ranges of it concurrently
+
+        the ranges are joined in order before parsing, so rows that straddle a
+        range boundary need no special handling. every range is pinned to the
+        ETag seen up front, so an object overwritten mid-download fails instead
+        of mixing versions
+        """
+        client = cls.get_s3_client()
+        head = client.head_object(Bucket=cls.bucket_name, Key=cls.object_key)
+        size, etag = head["ContentLength"], head["ETag"]
+        step = max(1, -(-size // n_chunks))
+        byte_ranges = [(lo, min(lo + step, size) - 1) for lo in range(0, size, step)]
+
+        def get_range(byte_range):
+            lo, hi = byte_range
+            csv_obj = client.get_object(
+                Bucket=cls.bucket_name,
+                Key=cls.object_key,
+                Range=f"bytes={lo}-{hi}",
+                IfMatch=etag,
+            )
+            return csv_obj["Body"].read()
+
+        with ThreadPoolExecutor(max_workers=n_chunks) as executor:
+            parts = list(executor.map(get_range, byte_ranges))
+
+        return pd.read_csv(
+            io.BytesIO(b"".join(parts)), engine="pyarrow", **read_csv_kwargs
+        )
+
+    @property
+    def read_csv_kwargs(self) -> Dict[str, Any]:
+        """extra pd.read_csv arguments used when loading the CSV"""
+        return {}
+
     def __init__(self) -> None:
-        self.df = self.load_csv()
+        self.df = self.load_csv(**self.read_csv_kwargs)
 
 
 class AnnotatedCsvLoader(S3CsvLoader):
     """Base class for loading annotated CSVs"""
 
+    group_names = ["IsBaseline", "Train", "Validate", "Test"]
+
     @property
     def descr(self):
         """add the README table here"""
@@ -80,46 +200,52 @@ class AnnotatedCsvLoader(S3CsvLoader):
     def subject_id_name(self):
         raise NotImplementedError
 
+    @property
+    def read_csv_kwargs(self) -> Dict[str, Any]:
+        """only parse the columns used by the trajectories, states as float32"""
+        return {
+            "usecols": [
+                self.subject_id_name,
+                self.time_name,
+                *self.state_names,
+                *self.group_names,
+            ],
+            "dtype": {name: "float32" for name in self.state_names},
+        }
+
     def load_trajectories(self) -> Dict[str, atraj.TrajectoriesData]:
         """Load the trajectories from the CSV"""
-        import numpy as np
-
-        def extract_time_states(df):
-            times = s_df[self.time_name].to_numpy().flatten()
-            idxs = np.argsort(times)
-            states = s_df[self.state_names].to_numpy()
-            return atraj.Trajectory(
-                times=times[idxs],
-                states=states[idxs],
-                inputs=None,
-                state_names=self.state_names,
-            )
-
-        # group by subject id
-        subjects_dfs = self.df.groupby(self.df[self.subject_id_name])
-
-        baseline_trajs = {}
-        train_trajs = {}
-        validate_trajs = {}
-        test_trajs = {}
-
-        for sid, s_df in subjects_dfs:
-            baseline_t = extract_time_states(s_df["IsBaseline"])
-            train_t = extract_time_states(s_df["Train"])
-            validate_t = extract_time_states(s_df["Validate"])
-            test_t = extract_time_states(s_df["Test"])
-
-            baseline_trajs[sid] = baseline_t
-            train_trajs[sid] = train_t
-            validate_trajs[sid] = validate_t
-            test_trajs[sid] = test_t
+        # order the rows by time once, so every subject's rows come out in order
+        order = np.argsort(self.df[self.time_name].to_numpy(), kind="stable")
+        times = self.df[self.time_name].to_numpy()[order]
+        # float32 row-major states, so each subject slice is a contiguous block
+        states = np.ascontiguousarray(
+            self.df[self.state_names].to_numpy(dtype=np.float32)[order]
+        )
 
-        return {
-            "IsBaseline": atraj.TrajectoriesData(baseline_trajs),
-            "Train": atraj.TrajectoriesData(train_trajs),
-            "Validate": atraj.TrajectoriesData(validate_trajs),
-            "Test": atraj.TrajectoriesData(test_trajs),
-        }
+        # positional rows per subject, grouping on the category codes
+        subject_ids = self.df[self.subject_id_name].astype("category").iloc[order]
+        subject_idxs = subject_ids.groupby(
+            subject_ids, sort=False, observed=True
+        ).indices
+
+        trajectories = {}
+        for groupname in self.group_names:
+            mask = self.df[groupname].to_numpy(dtype=bool)[order]
+            group_trajs = {}
+            for sid, idxs in subject_idxs.items():
+                # subject may not be in this group
+                idxs = idxs[mask[idxs]]
+                if len(idxs) > 0:
+                    group_trajs[sid] = atraj.Trajectory(
+                        times=times[idxs],
+                        states=states[idxs],
+                        inputs=None,
+                        state_names=self.state_names,
+                    )
+            trajectories[groupname] = atraj.TrajectoriesData(group_trajs)
+
+        return trajectories
 
 
 class GothPlasmaAnnotated(AnnotatedCsvLoader):
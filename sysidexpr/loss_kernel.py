@@ -0,0 +1,96 @@
+"""shared integration loss kernel for the sysidexpr losses"""
+import warnings
+from typing import Optional
+from typing import Tuple
+
+import autokoopman.core.trajectory as atraj
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+if numba is not None:
+    # no nnan fastmath flag, the kernel relies on isnan
+    @numba.njit(cache=True, parallel=True, fastmath={"reassoc", "contract"})
+    def _loss_kernel(times, states_sq, n_steps):
+        """sum dt * squared error over the first n_steps of every column, skipping NaNs"""
+        total = 0.0
+        for j in numba.prange(times.shape[1]):
+            for i in range(n_steps):
+                v = (times[i + 1, j] - times[i, j]) * states_sq[i + 1, j]
+                if not np.isnan(v):
+                    total += v
+        return total
+
+else:
+
+    def _loss_kernel(times, states_sq, n_steps):
+        """sum dt * squared error over the first n_steps of every column, skipping NaNs"""
+        dts = np.diff(times, axis=0)
+        return np.nansum(dts[:n_steps] * states_sq[1 : n_steps + 1])
+
+
+def _pad_squared_diffs(
+    diff: atraj.TrajectoriesData,
+) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """pack the trajectories into NaN padded (T_max, N) arrays
+
+    every trajectory gets a column of times and a column of squared errors
+    summed over its states, so the loss reduces over all trajectories at once
+    """
+    trajs = [t for t in diff if len(t.times) >= 2]
+    t_max = max((len(t.times) for t in trajs), default=0)
+
+    times_padded = np.full((t_max, len(trajs)), np.nan)
+    states_sq_padded = np.full((t_max, len(trajs)), np.nan)
+    has_nans = False
+    for col, t in enumerate(trajs):
+        states = np.reshape(t.states, (len(t.times), -1))
+        k = len(t.times)
+        times_padded[:k, col] = t.times
+        # reduce over the states first, NaN errors drop out of the sum
+        states_sq_padded[:k, col] = np.nansum(states**2.0, axis=1)
+        # only samples after the first are integrated
+        has_nans = has_nans or bool(np.isnan(states[1:]).any())
+
+    return times_padded, states_sq_padded, has_nans
+
+
+def prep_diff(
+    data: atraj.TrajectoriesData, pred: atraj.TrajectoriesData
+) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """padded squared differences of pred and data
+
+    compute this once and pass it to loss_total to share it between losses
+    """
+    # compute a trajectory where x_i = \|y_i - \hat{y}_i\|_2
+    return _pad_squared_diffs((pred - data).norm())
+
+
+def loss_total(
+    data: atraj.TrajectoriesData,
+    pred: atraj.TrajectoriesData,
+    n: Optional[int] = None,
+    prepped: Optional[Tuple[np.ndarray, np.ndarray, bool]] = None,
+) -> float:
+    """integrate the squared error over (the first n samples of) every trajectory
+
+    prepped is the prep_diff(data, pred) result, computed here if not given
+    """
+    if prepped is None:
+        prepped = prep_diff(data, pred)
+    times, states_sq, has_nans = prepped
+
+    # dealing with NaNs in eval is dangerous as predictor with
+    # a lot of NaNs will score well
+    if has_nans:
+        warnings.warn("NaNs in penalty loss")
+
+    # NaN samples (and the padding) drop out of the sum
+    n_steps = max(times.shape[0] - 1, 0)
+    if n is not None:
+        n_steps = min(n, n_steps)
+    return _loss_kernel(times, states_sq, n_steps)
@@ -1,6 +1,7 @@
 """Pydantic schema for the sysidexpr model experiments"""
 import os
 import pathlib
+from collections import defaultdict
 from typing import List
 
 import pydantic
@@ -22,10 +23,32 @@ class BenchmarkSchema(pydantic.BaseModel):
     """list of benchmarks"""
     benchmarks: List[BenchmarkConfiguration]
 
+    def check_paths_exist(self):
+        """check that the data csv of every benchmark exists
+
+        this lists each data directory once instead of stat-ing every file
+        """
+        csv_names = defaultdict(set)
+        for benchmark in self.benchmarks:
+            csv_names[benchmark.data_csv.parent].add(benchmark.data_csv.name)
+
+        for dirname, names in csv_names.items():
+            try:
+                with os.scandir(dirname) as entries:
+                    found = {entry.name for entry in entries if entry.is_file()}
+            except FileNotFoundError:
+                found = set()
+            missing = names - found
+            if missing:
+                raise ValueError(f"files {sorted(missing)} not found in {dirname}")
+
 
 class PredictionConfiguration(pydantic.BaseModel):
     """model to compare prediction trajectories against a benchmark"""
 
+    # allow the model_name field
+    model_config = pydantic.ConfigDict(protected_namespaces=())
+
     model_name: str
     benchmark: BenchmarkConfiguration
     pred_csv: pathlib.Path
@@ -41,6 +64,9 @@ class Metric(pydantic.BaseModel):
 class PredictionResult(pydantic.BaseModel):
     """prediction result model"""
 
+    # allow the model_name field
+    model_config = pydantic.ConfigDict(protected_namespaces=())
+
     model_name: str
     benchmark_name: str
     metric: Metric
@@ -1,8 +1,12 @@
 """hyperparameter tuner for sysidexpr models"""
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
 from typing import Any
 from typing import Callable
 from typing import Dict
 from typing import Generator
+from typing import Optional
 from typing import Tuple
 
 import autokoopman.core.trajectory as atraj
@@ -11,6 +15,11 @@ import numpy as np
 from sysidexpr.model import Metric
 
 
+def _run_experiment(experiment_runner, training_data, validation_data, hyperparam):
+    """run one experiment (module level so it can be sent to worker processes)"""
+    return experiment_runner(training_data, validation_data, *hyperparam)
+
+
 class HyperparamTuner:
     """hyperparameter tuner for sysidexpr models"""
 
@@ -20,17 +29,20 @@ class HyperparamTuner:
         validation_data: atraj.TrajectoriesData,
         hyperparameters,
         experiment_runner: Callable[[Any], Tuple[Tuple[Metric, float], Dict[str, Any]]],
+        n_jobs: Optional[int] = 1,
     ) -> None:
         """hyperparameter tuner for sysidexpr models
         :param training_data: training data
         :param validation_data: validation data
         :param hyperparameters: generator of hyperparameters
         :param experiment_runner: function that takes a hyperparameter and returns a metric and score
+        :param n_jobs: number of worker processes (None for all cores); the runner must be picklable when n_jobs != 1
         """
         self.training_data = training_data
         self.validation_data = validation_data
         self.hyperparameters = hyperparameters
         self.experiment_runner = experiment_runner
+        self.n_jobs = n_jobs
 
         self.metrics = []
         self.scores = []
@@ -42,19 +54,40 @@ class HyperparamTuner:
 
     def tune(self):
         """run the tuner"""
-        for hyperparam in self.hyperparameters:
-            (metric, score), hyperparam = self.experiment_runner(self.training_data, self.validation_data, *hyperparam)
+        hp_list = list(self.hyperparameters)
+        run = functools.partial(
+            _run_experiment,
+            self.experiment_runner,
+            self.training_data,
+            self.validation_data,
+        )
+
+        if self.n_jobs == 1:
+            results = map(run, hp_list)
+        else:
+            # batch the tasks so the data isn't pickled once per hyperparameter
+            n_workers = self.n_jobs or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                results = list(
+                    executor.map(
+                        run, hp_list, chunksize=max(1, len(hp_list) // (4 * n_workers))
+                    )
+                )
+
+        # scores go straight into an array, ready for the argmin/argmax
+        self.metrics = []
+        self.scores = np.empty(len(hp_list))
+        self.hyperparams = []
+        for idx, ((metric, score), hyperparam) in enumerate(results):
             self.metrics.append(metric)
-            self.scores.append(score)
+            self.scores[idx] = score
             self.hyperparams.append(hyperparam)
 
-        if self.metrics[0].lower_better:
-            best_idx = np.argmin(self.scores)
-        else:
-            best_idx = np.argmax(self.scores)
+        select_best = np.argmin if self.metrics[0].lower_better else np.argmax
+        best_idx = select_best(self.scores)
 
         best_metric = self.metrics[best_idx]
-        best_score = self.scores[best_idx]
+        best_score = float(self.scores[best_idx])
         best_hyperparams = self.hyperparams[best_idx]
 
         self.best_metric = best_metric